@@ -1,20 +1,42 @@
 import gdal
 import sys
 import os
-import glob2
 import csv
 import time
-start_time = time.time()
+import itertools
+import concurrent.futures
+
 # this allows GDAL to throw Python Exceptions
 gdal.UseExceptions()
 
 # Script will recursively go through subdirectories and report information about each tif image. If there is
 # a corrupt image it will add an entry to a csv. place script in parent folder and run.
 
-lst = glob2.glob('**\*.jpg')
+# number of paths checked per task, keeps inter-process overhead low
+CHUNK_SIZE = 64
+
+# number of tasks queued on the executor at a time, keeps memory bounded on large archives
+MAX_PENDING = 4 * os.cpu_count()
+
+
+def walk_jpgs(root):
+    # recursively yield jpg paths below root without building a list
+    # unreadable directories are reported and skipped rather than ending the scan
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from walk_jpgs(entry.path)
+                elif entry.name.lower().endswith('.jpg'):
+                    yield entry.path
+    except OSError as e:
+        print('Unable to read directory ' + root)
+        print(e)
 
-for file in lst:
 
+def check_one(file):
+    # read header information for a single jpg
+    # to be passed to executor for concurrency
     try:
         jpg = gdal.Open(file)
         # print gtif.GetMetadata()
@@ -22,33 +44,64 @@ for file in lst:
         size = statinfo.st_size / 1e6
         cols = jpg.RasterXSize
         rows = jpg.RasterYSize
+        bands = jpg.RasterCount
 
-        print(file,' -- ', size, 'Mb')
-        # print size, "Mb"
+        jpg = None
 
-        print("     bands", jpg.RasterCount, ' -- ', cols, "cols x ", rows, " rows")
-        # print cols, " cols x ", rows, " rows"
+    except RuntimeError as e:
+        return file, None, None, None, None, str(e)
 
-        jpg = None
+    return file, size, cols, rows, bands, None
 
 
-    except (RuntimeError, e):
-        print('Unable to open '+file)
-        print(e)
-        x = file, e
-        # print x
-        # sys.exit(1)
-        with open('image_errors.csv', 'ab') as csvfile:
-            wr = csv.writer(csvfile, delimiter=',')
-            wr.writerow(x)
+def check_many(files):
+    # check a chunk of jpgs in a single task
+    return [check_one(file) for file in files]
+
+
+def main():
+
+    start_time = time.time()
+
+    count = 0
+
+    with open('image_errors.csv', 'w', newline='', buffering=1 << 16) as csvfile, \
+            concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+
+        wr = csv.writer(csvfile, delimiter=',')
+
+        # split the stream of paths into chunks, without reading the whole walk up front
+        paths = walk_jpgs(os.curdir)
+        chunks = iter(lambda: list(itertools.islice(paths, CHUNK_SIZE)), [])
 
-print("--- %s seconds ---" % (time.time() - start_time))
-print(len(lst), 'files')
+        # keep a bounded number of chunks in flight, topping up as each one completes
+        pending = {executor.submit(check_many, chunk) for chunk in itertools.islice(chunks, MAX_PENDING)}
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            pending |= {executor.submit(check_many, chunk) for chunk in itertools.islice(chunks, len(done))}
 
+            # results are reported in completion order
+            for future in done:
+                for file, size, cols, rows, bands, e in future.result():
 
+                    count += 1
 
+                    if e is None:
+                        print(file, ' -- ', size, 'Mb')
+                        # print size, "Mb"
 
+                        print("     bands", bands, ' -- ', cols, "cols x ", rows, " rows")
+                        # print cols, " cols x ", rows, " rows"
 
+                    else:
+                        print('Unable to open ' + file)
+                        print(e)
+                        # sys.exit(1)
+                        wr.writerow((file, e))
 
+    print("--- %s seconds ---" % (time.time() - start_time))
+    print(count, 'files')
 
 
+if __name__ == '__main__':
+    main()
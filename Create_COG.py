@@ -2,24 +2,281 @@ import subprocess
 import gdal
 import os
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from itertools import chain, repeat
+from types import MappingProxyType
 from tkinter.filedialog import askdirectory
 from tkinter import Tk
-from glob import glob
+from glob import iglob
 from tqdm import tqdm
 
+# number of files handed to a worker at a time, kept small so the tail of a batch stays balanced
+CHUNKSIZE = 4
+
+# a pool already keeps one file per core busy, so each file in a pool is processed on a single thread
+POOL_NUM_THREADS = '1'
+
+# stands in for the predictor in command strings, filled in by the worker once the source is open
+PREDICTOR_PLACEHOLDER = '{predictor}'
+
+# read-only mapping of projections and EPSG codes, built once at import
+_PROJECTIONS = MappingProxyType({
+    'utm08': 3155, 'utm8': 3155, 'utm09': 3156, 'utm9': 3156,
+    'utm10': 3157, 'utm11': 2955, 'bcalb': 3005
+})
+
 
 def PROJECTIONS():
     """
     Return constant PROJECTIONS.
 
-    :return: A dictionary of projections and EPSG codes.
+    :return: A read-only dictionary of projections and EPSG codes.
+    """
+
+    return _PROJECTIONS
+
+
+def _set_config_options(config_options):
+
+    """
+    Set global GDAL configuration options.
+
+    :param config_options:  A dictionary of configuration option names and values.
+    """
+
+    for key, value in config_options.items():
+        gdal.SetConfigOption(key, value)
+
+
+def _init_worker(config_options):
+
+    """
+    Prepare GDAL in a worker process.
+
+    Configuration options are per process, so they are set again in each worker.
+
+    :param config_options:  A dictionary of configuration option names and values.
+    """
+
+    _set_config_options(config_options)
+
+    # make use of python exceptions
+    gdal.UseExceptions()
+
+
+def _parallel_map(func, *iterables, total=None, config_options=None, backend='process'):
+
+    """
+    Map a function over iterables using a pool of workers.
+
+    :param func:            Module level function to be called in each worker.
+    :param iterables:       Iterables of arguments passed to func.
+    :param total:           Number of items, used for the progress bar.
+    :param config_options:  GDAL configuration options to set in each worker process.
+    :param backend:         'process' for a pool of processes, 'thread' for a pool of threads.
+    :return:                List of results in input order.
+    """
+
+    workers = os.cpu_count()
+
+    # GDAL releases the GIL while it works, and threads share this process' config options,
+    # so limit GDAL to one thread per worker for the duration of the batch
+    if backend == 'thread':
+        num_threads = gdal.GetConfigOption('GDAL_NUM_THREADS')
+        gdal.SetConfigOption('GDAL_NUM_THREADS', POOL_NUM_THREADS)
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                return list(tqdm(executor.map(func, *iterables), total=total))
+        finally:
+            gdal.SetConfigOption('GDAL_NUM_THREADS', num_threads)
+
+    if backend != 'process':
+        raise ValueError(f"Unknown parallel backend '{backend}', expected 'process' or 'thread'")
+
+    config_options = dict(config_options or {})
+    config_options['GDAL_NUM_THREADS'] = POOL_NUM_THREADS
+
+    # the block cache is per process, so split a percentage budget of RAM between the workers, in MB
+    cache_max = config_options.get('GDAL_CACHEMAX', '')
+    if cache_max.endswith('%'):
+        budget = gdal.GetUsablePhysicalRAM() * float(cache_max[:-1]) / 100
+        config_options['GDAL_CACHEMAX'] = str(max(1, int(budget / workers) // (1 << 20)))
+
+    with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(config_options,)
+    ) as executor:
+        return list(tqdm(executor.map(func, *iterables, chunksize=CHUNKSIZE), total=total))
+
+
+def _out_path(file, out_dir):
+
+    """
+    Get the output tif path for an input file.
+
+    :param file:        Input raster file.
+    :param out_dir:     Output directory.
+    :return:            Output path.
+    """
+
+    return os.path.join(out_dir, f'{os.path.splitext(os.path.basename(file))[0]}.tif')
+
+
+def _pending_files(list_of_files, out_dir):
+
+    """
+    Get the input files whose outputs still need to be written.
+
+    Outputs are named after the input file, so only the first input for each
+    output path is kept, later ones are reported rather than written concurrently.
+
+    :param list_of_files:   A list of input files.
+    :param out_dir:         Output directory.
+    :return:                Tuple of pending files and errors for inputs sharing an output path.
+    """
+
+    files, errors, seen = [], [], set()
+    for file in list_of_files:
+        out_path = _out_path(file, out_dir)
+
+        # move on to next file if file exists
+        if os.path.exists(out_path):
+            continue
+
+        # another input already writes to this output
+        if out_path in seen:
+            errors.append((file, f'Output {out_path} is already written from another input'))
+            continue
+
+        seen.add(out_path)
+        files.append(file)
+
+    return files, errors
+
+
+@lru_cache(maxsize=None)
+def _translate_options(trans_str):
+
+    """
+    Parse a gdal_translate command string into a TranslateOptions object.
+
+    Cached, so each process only parses each distinct command string once.
+
+    :param trans_str:   gdal_translate command string.
+    :return:            gdal_translate options.
+    """
+
+    return gdal.TranslateOptions(gdal.ParseCommandLine(trans_str))
+
+
+def _predictor_from_datatype(data_type):
+
+    """
+    Get predictor from the raster data type.
+
+    Floating point prediction only suits float rasters,
+    integer DEMs use horizontal differencing instead.
+
+    :param data_type:   GDAL data type of the raster.
+    :return:            Predictor.
+    """
+
+    return 3 if data_type in (gdal.GDT_Float32, gdal.GDT_Float64) else 2
+
+
+def _translate_one(file, out_dir, trans_str):
+
+    """
+    Translate a single file into the output directory.
+
+    :param file:        Input raster file.
+    :param out_dir:     Output directory.
+    :param trans_str:   gdal_translate command string, may contain PREDICTOR_PLACEHOLDER.
+    :return:            Tuple of input file and error message, None if successful.
+    """
+
+    # define output name
+    out_name = _out_path(file, out_dir)
+
+    # options objects can't be pickled, so parse the command string in the worker
+    try:
+        src = gdal.Open(file)
+
+        # pick the predictor here so each file is only opened once
+        if PREDICTOR_PLACEHOLDER in trans_str:
+            predictor = _predictor_from_datatype(src.GetRasterBand(1).DataType)
+            trans_str = trans_str.replace(PREDICTOR_PLACEHOLDER, str(predictor))
+
+        gdal.Translate(out_name, src, options=_translate_options(trans_str))
+        src = None  # close the datasource
+
+    # return any errors encountered to be logged by the caller
+    except Exception as e:
+        return file, str(e)
+
+    return file, None
+
+
+def _log_errors(results, err_path):
+
+    """
+    Write errors returned by the workers to a text file.
+
+    :param results:     Tuples of input file and error message, None if successful.
+    :param err_path:    Path of the error log.
+    """
+
+    errors = [f'{file}\t{e}\n' for file, e in results if e is not None]
+
+    # open the log once, and only if something failed
+    if errors:
+        with open(err_path, 'a+') as err_file:
+            err_file.writelines(errors)
+
+
+def _as_vrt(files, out_vrt):
+
+    """
+    Mosaic a list of files into a virtual raster.
+
+    :param files:       A list of input rasters.
+    :param out_vrt:     Output VRT path.
+    :return:            Output VRT path.
     """
-    projections = {
-        'utm08': 3155, 'utm8': 3155, 'utm09': 3156, 'utm9': 3156,
-        'utm10': 3157, 'utm11': 2955, 'bcalb': 3005
-    }
 
-    return projections
+    vrt = gdal.BuildVRT(out_vrt, files, options=gdal.BuildVRTOptions(resolution='highest'))
+    vrt = None  # close the datasource to flush the VRT to disk
+
+    return out_vrt
+
+
+def _build_overviews(file, resampling, levels, blocksize):
+
+    """
+    Create overviews for a single file.
+
+    :param file:        A tif file.
+    :param resampling:  Resampling method.
+    :param levels:      List of overview levels, None to pick levels from the raster size.
+    :param blocksize:   Tile size, used to pick overview levels.
+    """
+
+    # open for update so the overviews are embedded rather than written to an external .ovr
+    im = gdal.Open(file, gdal.GA_Update)
+
+    # halve until the smallest overview fits in a single tile
+    if levels is None:
+        levels = []
+        size = max(im.RasterXSize, im.RasterYSize)
+        while size > blocksize:
+            levels.append(2 ** (len(levels) + 1))
+            size = (size + 1) // 2
+
+    # rasters that already fit in a single tile need no overviews
+    if levels:
+        im.BuildOverviews(resampling, levels)  # create overviews
+
+    im = None  # close the datasource
 
 
 class CloudOptimizedGeotiff:
@@ -31,23 +288,36 @@ class CloudOptimizedGeotiff:
     to Cloud Optimized Geotiffs.
     """
 
-    def __init__(self):
-        
+    def __init__(self, resampling='average'):
+
+        """
+        Initialize creation option values.
+
+        :param resampling:  Overview resampling method, 'average' for continuous data,
+                            'nearest' or 'mode' for categorical rasters.
+        """
+
         # Define creation option values.
-        self.predictor = 3 
+        self.predictor = 3
         self.epsg = None
-        self.compress_method = 'DEFLATE'
-        self.compress_level = 6  
-        self.overview_levels = [2, 4]
-        self.resampling = 'cubic'
+        self.compress_method = 'ZSTD'
+        self.compress_level = 6  # DEFLATE level
+        self.zstd_level = 9
+        self.overview_levels = None  # None picks levels from the raster size
+        self.resampling = resampling
         self.blockxsize = 512
         self.blockysize = 512
 
         # set global GDAL configuration options
-        gdal.SetConfigOption(
-            ('GDAL_TIFF_OVR_BLOCKSIZE', f'{self.blockxsize}'),
-            ('COMPRESS_OVERVIEW', f'{self.compress_method}')
-        )
+        self.config_options = {
+            'GDAL_TIFF_OVR_BLOCKSIZE': str(self.blockxsize),
+            'COMPRESS_OVERVIEW': self.compress_method,
+            'GDAL_NUM_THREADS': 'ALL_CPUS',  # multithreaded compression for single files, pools use one thread
+            'GDAL_DISABLE_READDIR_ON_OPEN': 'TRUE',  # skip listing sibling files on every open
+            'GDAL_CACHEMAX': '25%',  # block cache as a share of RAM
+            'VSI_CACHE': 'TRUE',  # cache reads, helps passes that re-read full rasters
+        }
+        _set_config_options(self.config_options)
 
         # make use of python exceptions
         gdal.UseExceptions()
@@ -64,44 +334,42 @@ class CloudOptimizedGeotiff:
 
         self.compress_method += f' -co JPEG_QUALITY={jpeg_quality}'
 
-    def batch_compress_and_tile(self, list_of_files: list, out_dir: str):
+    def batch_compress_and_tile(self, list_of_files: list, out_dir: str, parallel_backend='process'):
 
         """
         Compress and internally tile a list of files.
 
 
-        :param list_of_files:   A list of usgs or ascii dems.
-        :param out_dir:         Directory
+        :param list_of_files:       A list of usgs or ascii dems.
+        :param out_dir:             Directory
+        :param parallel_backend:    'process', or 'thread' for many small files.
         :return:
         """
 
-        # change directory to output location
-        os.chdir(out_dir)
-        
-        # loop through files and convert, compress, and internally tile new tif files
-        for file in tqdm(list_of_files):
-
-            # define output name
-            out_name = f'{os.path.splitext(os.path.basename(file))[0]}.tif'
+        # resolve the command string for each file up front, the workers only translate
+        pending, errors = _pending_files(list_of_files, out_dir)
+        files, trans_strs = [], []
+        for file in pending:
 
-            # move on to next file if file exists
-            if os.path.exists(out_name):
+            # get the epsg code, files without one are logged rather than written without a projection
+            try:
+                epsg = self.epsg_from_filename(file)
+            except ValueError as e:
+                errors.append((file, str(e)))
                 continue
 
-            # get the epsg code
-            self.epsg_from_filename(file)
-
-            # create translate options object
-            translate_options = self.create_translate_options()
+            # the predictor is picked from the data type by the worker
+            files.append(file)
+            trans_strs.append(self.create_translate_string(POOL_NUM_THREADS, PREDICTOR_PLACEHOLDER, epsg))
 
-            # perform compression and tiling
-            try:
-                gdal.Translate(out_name, file, options=translate_options)
+        # convert, compress, and internally tile new tif files in parallel
+        results = _parallel_map(
+            _translate_one, files, repeat(out_dir), trans_strs,
+            total=len(files), config_options=self.config_options, backend=parallel_backend
+        )
 
-            # log any errors encountered
-            except Exception as e:
-                with open(os.path.join(out_dir, 'compression_and_tiling_errors.txt'), 'a+') as err_file:
-                    err_file.write(f'{file}\t{e}\n')
+        # log any errors encountered
+        _log_errors(errors + results, os.path.join(out_dir, 'compression_and_tiling_errors.txt'))
 
     def create_translate_options(self):
 
@@ -111,22 +379,58 @@ class CloudOptimizedGeotiff:
         :return: gdal_translate options.
         """
 
+        # pass parsed string to TranslateOptions object
+        return _translate_options(self.create_translate_string())
+
+    def create_translate_string(self, num_threads='ALL_CPUS', predictor=None, epsg=None):
+
+        """
+        Create gdal_translate command string.
+
+        :param num_threads: Number of threads used to compress each file.
+        :param predictor:   Predictor for the file, defaults to self.predictor.
+        :param epsg:        EPSG code for the file, defaults to self.epsg.
+        :return:            gdal_translate command string.
+        """
+
+        if predictor is None:
+            predictor = self.predictor
+        if epsg is None:
+            epsg = self.epsg
+
         # amend gdal command string for jpeg
         if self.compress_method == 'JPEG':
             self.set_jpeg_quality()
 
         # Create gdal_translate command options
         trans_str = (
-            f'-of GTiff -a_srs EPSG:{str(self.epsg)} '
-            f'-co PREDICTOR={str(self.predictor)} -q '
-            f'-co TILED=YES -co NUM_THREADS=ALL_CPUS '
-            f'-co COMPRESS={self.compress_method} '
-            f'-co ZLEVEL={str(self.compress_level)}'
+            f'-of GTiff -a_srs EPSG:{str(epsg)} '
+            f'-co PREDICTOR={str(predictor)} -q '
+            f'-co TILED=YES -co NUM_THREADS={num_threads} '
+            f'-co BLOCKXSIZE={str(self.blockxsize)} '
+            f'-co BLOCKYSIZE={str(self.blockysize)} '
+            f'-co BIGTIFF=IF_SAFER -co SPARSE_OK=TRUE '
+            f'{self.create_compression_string()}'
         )
-        # pass parsed string to TranslateOptions object
-        return gdal.TranslateOptions(gdal.ParseCommandLine(trans_str))
 
-    def epsg_from_filename(self, filename):
+        return trans_str
+
+    def create_compression_string(self):
+
+        """
+        Create the compression part of a gdal_translate command string.
+
+        :return: gdal_translate compression options.
+        """
+
+        # ZSTD and DEFLATE take different level options
+        if self.compress_method == 'ZSTD':
+            return f'-co COMPRESS={self.compress_method} -co ZSTD_LEVEL={str(self.zstd_level)}'
+
+        return f'-co COMPRESS={self.compress_method} -co ZLEVEL={str(self.compress_level)}'
+
+    @staticmethod
+    def epsg_from_filename(filename):
 
         """
         Get epsg code from filename.
@@ -134,14 +438,17 @@ class CloudOptimizedGeotiff:
         Created for GeoBC. Will only work with GeoBC naming conventions.
 
         :param filename:    GeoBC approved filename.
+        :return:            EPSG code.
+        :raises ValueError: If there is no projection in the filename.
         """
 
         # try to get projection from filename, if no projection in the filename, filename is wrong.
-        for index, string in enumerate(os.path.splitext(os.path.basename(filename))[0].split('_')):
-            if 'utm' in string or 'bcalb' in string:  # check for proj in filename
-                # use index value as key to get value from dictionary
-                self.epsg = PROJECTIONS()[string]
-                break
+        for token in os.path.splitext(os.path.basename(filename))[0].split('_'):
+            code = _PROJECTIONS.get(token)
+            if code is not None:
+                return code
+
+        raise ValueError(f'No projection found in filename {os.path.basename(filename)}')
 
     """Method to create overviews using GDAL's python api"""
     def batch_create_overviews(self, list_of_files):
@@ -153,69 +460,173 @@ class CloudOptimizedGeotiff:
         :return:
         """
 
-        # loop through files, create overviews
-        for f in tqdm(list_of_files):
-            im = gdal.Open(f)
-            im.BuildOverviews('CUBIC', self.overview_levels)  # create overviews
-            im = None  # close the datasource
+        # create overviews for each file in parallel
+        _parallel_map(
+            _build_overviews, list_of_files,
+            repeat(self.resampling.upper()), repeat(self.overview_levels), repeat(self.blockxsize),
+            total=len(list_of_files), config_options=self.config_options
+        )
 
-    def batch_create_cog(self, list_of_files, out_dir):
+    def batch_create_cog(self, list_of_files, out_dir, parallel_backend='process'):
 
         """
         Create cloud optimized geotiffs.
 
-        :param list_of_files:   A list of input files.
-        :param out_dir:         Output location.
+        :param list_of_files:       A list of input files.
+        :param out_dir:             Output location.
+        :param parallel_backend:    'process', or 'thread' for many small files.
         """
 
         # create gdal_translate command string
         trans_str = (
             f'-co TILED=YES '
             f'-co COPY_SRC_OVERVIEWS=YES '
-            f'-co COMPRESS={self.compress_method} '
-            f'-co NUM_THREADS=ALL_CPUS '
+            f'{self.create_compression_string()} '
+            f'-co NUM_THREADS={POOL_NUM_THREADS} '
             f'-co BLOCKXSIZE={str(self.blockxsize)} '
-            f'-co BLOCKYSIZE={str(self.blockysize)}'
+            f'-co BLOCKYSIZE={str(self.blockysize)} '
+            f'-co BIGTIFF=IF_SAFER -co SPARSE_OK=TRUE'
+        )
+
+        # define output path for cloud optimized geotiffs
+        out = os.path.join(out_dir, 'COG')
+        os.makedirs(out, exist_ok=True)
+
+        # if file already exists, pass
+        files, errors = _pending_files(list_of_files, out)
+
+        # make COGS in parallel
+        results = _parallel_map(
+            _translate_one, files, repeat(out), repeat(trans_str),
+            total=len(files), config_options=self.config_options, backend=parallel_backend
         )
 
-        # parse command line syntax to be passed to translate options
-        tp = gdal.ParseCommandLine(trans_str)
+        # log any errors encountered
+        _log_errors(errors + results, os.path.join(out, 'COG_creation_errors.txt'))
 
-        # pass parsed string to TranslateOptions object
-        trans_opt = gdal.TranslateOptions(tp)
+    def batch_create_cog_direct(self, list_of_files, out_dir, parallel_backend='process'):
+
+        """
+        Create cloud optimized geotiffs in a single pass.
+
+        Uses the GDAL COG driver (GDAL >= 3.1) to compress, tile,
+        and build overviews without writing intermediate files.
+
+        :param list_of_files:       A list of usgs or ascii dems.
+        :param out_dir:             Output location.
+        :param parallel_backend:    'process', or 'thread' for many small files.
+        """
 
         # define output path for cloud optimized geotiffs
         out = os.path.join(out_dir, 'COG')
-        os.mkdir(out)  # make the dir
-        os.chdir(out)  # navigate to dir
-
-        # loop the files and convert
-        for file in tqdm(list_of_files):
-            out_name = f'{os.path.splitext(os.path.basename(file))[0]}.tif'
-            # if file already exists, pass
-            if os.path.exists(out_name):
-                continue
+        os.makedirs(out, exist_ok=True)
+
+        # resolve the command string for each file up front, the workers only translate
+        pending, errors = _pending_files(list_of_files, out)
+        files, trans_strs = [], []
+        for file in pending:
 
-            # make COGS
+            # get the epsg code, files without one are logged rather than written without a projection
             try:
-                gdal.Translate(out_name, file, options=trans_opt)  # pass translate options to gdal.Translate()
+                epsg = self.epsg_from_filename(file)
+            except ValueError as e:
+                errors.append((file, str(e)))
+                continue
 
-            # log any errors encountered
-            except Exception as e:
-                with open(os.path.join(out, 'COG_creation_errors.txt'), 'a+') as err_file:
-                    err_file.write(f'{file}\t{e}\n')
+            files.append(file)
+            trans_strs.append(self.create_cog_string(POOL_NUM_THREADS, epsg))
 
-    @staticmethod
-    def remove_intermediate_tif(in_dir):
+        # make COGS in parallel
+        results = _parallel_map(
+            _translate_one, files, repeat(out), trans_strs,
+            total=len(files), config_options=self.config_options, backend=parallel_backend
+        )
+
+        # log any errors encountered
+        _log_errors(errors + results, os.path.join(out, 'COG_creation_errors.txt'))
+
+    def create_mosaic_cog(self, list_of_files, out_dir, name='mosaic'):
+
+        """
+        Create a single cloud optimized geotiff from a mosaic of files.
+
+        Input tiles are combined into a VRT so they are read in one pass,
+        then written with the GDAL COG driver (GDAL >= 3.1).
+
+        :param list_of_files:   A list of usgs or ascii dems sharing one projection.
+        :param out_dir:         Output location.
+        :param name:            Output filename, without extension.
+        :raises RuntimeError:   If the GDAL COG driver is not available.
+        :raises ValueError:     If the inputs don't share a single projection.
+        """
 
-        """Remove intermediate tif files created."""
+        # the mosaic is written in one pass, there is no three pass fallback
+        if gdal.GetDriverByName('COG') is None:
+            raise RuntimeError('Mosaic mode requires the GDAL COG driver (GDAL >= 3.1)')
 
-        # Remove intermediate files
-        [os.remove(f) for f in glob(os.path.join(in_dir, '*.tif'))]
+        # define output path for cloud optimized geotiffs
+        out = os.path.join(out_dir, 'COG')
+        os.makedirs(out, exist_ok=True)
+
+        # move on if the mosaic exists, like the other batch methods
+        if os.path.exists(_out_path(name, out)):
+            return
+
+        # a mosaic can only be assigned a single projection
+        epsg_codes = {self.epsg_from_filename(file) for file in list_of_files}
+        if len(epsg_codes) != 1:
+            raise ValueError(f'Mosaic inputs must share a single projection, found EPSG codes {epsg_codes}')
+        epsg = epsg_codes.pop()
+
+        # build the mosaic and translate it once
+        vrt = _as_vrt(list_of_files, os.path.join(out, f'{name}.vrt'))
+        try:
+            results = [_translate_one(vrt, out, self.create_cog_string(epsg=epsg))]
+        finally:
+            os.remove(vrt)
+
+        # log any errors encountered
+        _log_errors(results, os.path.join(out, 'COG_creation_errors.txt'))
+
+    def create_cog_string(self, num_threads='ALL_CPUS', epsg=None):
+
+        """
+        Create gdal_translate command string for the COG driver.
+
+        :param num_threads: Number of threads used to compress each file.
+        :param epsg:        EPSG code for the file, defaults to self.epsg.
+        :return:            gdal_translate command string.
+        """
+
+        if epsg is None:
+            epsg = self.epsg
 
-    def run_cog_conversion(self):
+        # the COG driver takes a single level option for DEFLATE and ZSTD
+        level = self.zstd_level if self.compress_method == 'ZSTD' else self.compress_level
 
-        """Run full conversion process."""
+        # the COG driver's SPARSE_OK option was added in GDAL 3.2
+        sparse_ok = '-co SPARSE_OK=TRUE ' if int(gdal.VersionInfo()) >= 3020000 else ''
+
+        # PREDICTOR=YES lets the driver pick floating point or horizontal prediction from the data type,
+        # RESAMPLING (GDAL >= 3.1) only applies to overviews here since -a_srs does not reproject
+        trans_str = (
+            f'-of COG -a_srs EPSG:{str(epsg)} -q '
+            f'-co COMPRESS={self.compress_method} -co LEVEL={str(level)} '
+            f'-co PREDICTOR=YES -co BLOCKSIZE={str(self.blockxsize)} '
+            f'-co RESAMPLING={self.resampling.upper()} -co OVERVIEWS=AUTO '
+            f'-co BIGTIFF=IF_SAFER {sparse_ok}'
+            f'-co NUM_THREADS={num_threads}'
+        )
+
+        return trans_str
+
+    def run_cog_conversion(self, mosaic=False):
+
+        """
+        Run full conversion process.
+
+        :param mosaic:  Combine all input files into a single COG instead of one COG per file.
+        """
 
         # Close empty tkinter window
         Tk().withdraw()
@@ -223,19 +634,32 @@ class CloudOptimizedGeotiff:
         idir = askdirectory(title='Select input directory')
         odir = askdirectory(title='Select output directory')
 
-        # create list of files
-        flist = []
-        for e in ('*.asc', '*.dem', '*.tif'):
-            flist.extend(glob(os.path.join(idir, e), recursive=True))
+        # create list of files, including subdirectories
+        flist = list(chain.from_iterable(
+            iglob(os.path.join(idir, e), recursive=True) for e in ('**/*.asc', '**/*.dem', '**/*.tif')
+        ))
+
+        # write one cog from all input tiles
+        if mosaic:
+            self.create_mosaic_cog(flist, odir)
+            return
+
+        # write cogs in a single pass when the COG driver is available
+        if gdal.GetDriverByName('COG') is not None:
+            self.batch_create_cog_direct(flist, odir)
+            return
 
-        # run the gdal.Translate function
+        # otherwise fall back to translate, build overviews, translate again
         self.batch_compress_and_tile(flist, odir)
+        # intermediate tif files written for each input, inputs sharing a name share one tif
+        tifs = [tif for tif in dict.fromkeys(_out_path(file, odir) for file in flist) if os.path.exists(tif)]
         # generate overviews
-        self.batch_create_overviews(odir)
+        self.batch_create_overviews(tifs)
         # generate cogs from new tif files
-        self.batch_create_cog(glob(os.path.join(odir, '*.tif')), odir)
+        self.batch_create_cog(tifs, odir)
         # remove intermediate files
-        self.remove_intermediate_tif(odir)
+        for tif in tifs:
+            os.remove(tif)
 
 
 def main():
@@ -63,7 +63,8 @@ def compress_samples(odir):
     obj.compress_method = 'JPEG'                            # set compression method to JPEG
     obj.compress_and_tile(tif_list, dest)                   # compress and internally tile sample orthos
     obj.batch_create_overviews(dest)                        # create overviews for samples
-    obj.remove_intermediate_tif(ortho_dir)                  # remove initial samples
+    for f in tif_list:                                      # for initial samples
+        os.remove(f)                                        # remove initial samples
 
 
 def write_ortho_list(list, odir):